@@ -10,6 +10,8 @@ import argparse
 import logging
 from pathlib import Path
 
+from dotenv import load_dotenv
+
 from voice_isolator.processor import process_video, batch_process_videos
 from voice_isolator.utils.logger import setup_logger
 
@@ -55,6 +57,12 @@ def main():
         default="copy",
         help="Video codec to use (default: copy - no re-encoding)"
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Number of videos to process at the same time in batch mode (default: 4)"
+    )
     parser.add_argument(
         "--overwrite",
         action="store_true",
@@ -68,10 +76,21 @@ def main():
     
     args = parser.parse_args()
     
+    # Load environment variables from .env file (for API key)
+    load_dotenv()
+    
+    # The audio and video modules leave handler setup to the application
+    log_level = logging.DEBUG if args.verbose else logging.INFO
+    for name in ("voice_isolator.audio", "voice_isolator.video"):
+        setup_logger(name, level=log_level)
+    
     # Set logging level
     if args.verbose:
         logging.getLogger("voice_isolator").setLevel(logging.DEBUG)
     
+    if args.concurrency < 1:
+        parser.error(f"--concurrency must be at least 1: {args.concurrency}")
+    
     # Get API key
     api_key = args.api_key or os.environ.get("ELEVENLABS_API_KEY")
     if not api_key:
@@ -93,13 +112,16 @@ def main():
                 api_key=api_key,
                 video_codec=args.video_codec,
                 keep_temp_files=args.keep_temp,
-                overwrite=args.overwrite
+                overwrite=args.overwrite,
+                concurrency=args.concurrency
             )
             
             if output_files:
-                logger.info(f"Successfully processed {len(output_files)} video files")
-                for output_file in output_files:
-                    logger.info(f"  - {output_file}")
+                logger.info(
+                    "Successfully processed %d video files:\n  - %s",
+                    len(output_files),
+                    "\n  - ".join(map(str, output_files))
+                )
         
         # Single file processing mode
         else:
@@ -116,10 +138,10 @@ def main():
                 overwrite=args.overwrite
             )
             
-            logger.info(f"Successfully processed video: {output_file}")
+            logger.info("Successfully processed video: %s", output_file)
     
     except Exception as e:
-        logger.error(f"Error: {e}")
+        logger.error("Error: %s", e)
         return 1
     
     return 0
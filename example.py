@@ -8,6 +8,12 @@ from pathlib import Path
 from dotenv import load_dotenv
 
 from voice_isolator.processor import process_video, batch_process_videos
+from voice_isolator.utils.logger import setup_logger
+
+# Show the audio and video modules' progress, which they leave to the
+# application to set up
+for name in ("voice_isolator.audio", "voice_isolator.video"):
+    setup_logger(name)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -52,8 +58,7 @@ def example_batch_processing():
     )
     
     print(f"Processed {len(processed_videos)} videos:")
-    for video in processed_videos:
-        print(f"  - {video}")
+    print("\n".join(f"  - {video}" for video in processed_videos))
 
 
 if __name__ == "__main__":
@@ -42,6 +42,9 @@ setup(
         "ffmpeg-python>=0.2.0",
         "python-dotenv>=1.0.0",
     ],
+    extras_require={
+        "http2": ["httpx[http2]"],
+    },
     entry_points={
         "console_scripts": [
             "voice-isolator=cli:main",
@@ -1,5 +1,8 @@
 import unittest
 import os
+import sys
+import tempfile
+from pathlib import Path
 from voice_isolator.utils.logger import setup_logger
 
 class TestBasicFunctionality(unittest.TestCase):
@@ -9,6 +12,13 @@ class TestBasicFunctionality(unittest.TestCase):
         """Test that the logger setup function works."""
         logger = setup_logger("test_logger", level=20)  # INFO level
         self.assertIsNotNone(logger)
+    
+    def test_logger_setup_is_idempotent(self):
+        """Test that setting up a logger twice doesn't add duplicate handlers."""
+        logger = setup_logger("test_logger_twice")
+        handler_count = len(logger.handlers)
+        self.assertIs(setup_logger("test_logger_twice"), logger)
+        self.assertEqual(len(logger.handlers), handler_count)
         
     def test_package_imports(self):
         """Test that all package modules can be imported."""
@@ -28,6 +38,226 @@ class TestBasicFunctionality(unittest.TestCase):
         # Test utils
         from voice_isolator.utils import logger
         self.assertIsNotNone(logger)
+    
+    def test_client_is_reused(self):
+        """Test that the ElevenLabs client is shared per API key."""
+        from voice_isolator.audio.isolator import _get_client
+        self.assertIs(_get_client("test-key"), _get_client("test-key"))
+        self.assertIsNot(_get_client("test-key"), _get_client("other-key"))
+    
+    def test_find_files(self):
+        """Test that files are matched by extension, case-insensitively."""
+        from voice_isolator.utils.files import find_files
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name in ("a.mp4", "b.MOV", "c.txt"):
+                open(os.path.join(temp_dir, name), "w").close()
+            os.mkdir(os.path.join(temp_dir, "d.mp4"))
+            
+            found = find_files(temp_dir, (".mp4", ".mov"))
+            self.assertEqual(sorted(f.name for f in found), ["a.mp4", "b.MOV"])
+    
+    def test_run_process_keeps_stderr_tail(self):
+        """Test that a chatty process can't stall and only its stderr tail is kept."""
+        from voice_isolator.utils.process import run_process, stderr_tail
+        script = "import sys\nfor i in range(100000): print(i, file=sys.stderr)\nsys.exit(3)"
+        result = run_process([sys.executable, "-c", script])
+        self.assertEqual(result.returncode, 3)
+        lines = result.stderr.splitlines()
+        self.assertEqual(len(lines), 200)
+        self.assertEqual(lines[-1], b"99999")
+        self.assertEqual(stderr_tail(result.stderr, limit=6), "99999\n")
+    
+    def test_temp_files_are_unique_per_video(self):
+        """Test that same-stem videos sharing a temp directory don't share temp files."""
+        from unittest import mock
+        from voice_isolator import processor
+        
+        paths = []
+        with mock.patch.object(processor, "extract_audio_from_video", side_effect=lambda **kw: kw["output_path"]), \
+                mock.patch.object(processor, "isolate_voice", side_effect=lambda **kw: kw["output_path"]), \
+                mock.patch.object(processor, "merge_video_with_audio", side_effect=lambda **kw: kw["audio_path"]):
+            for name in ("clip.mp4", "clip.mov"):
+                paths.append(processor._process_video_via_files(
+                    processor.Path(name), processor.Path(f"out_{name}"),
+                    processor.Path("temp"), None, "copy", False
+                ))
+        
+        self.assertEqual(
+            [path.name for path in paths],
+            ["clip_mp4_isolated.mp3", "clip_mov_isolated.mp3"]
+        )
+    
+    def test_grouped_merge_command(self):
+        """Test that a grouped merge maps each output to its own pair of inputs."""
+        import subprocess
+        from unittest import mock
+        from voice_isolator.video import merger
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            jobs = [
+                (Path(temp_dir, "a.mkv"), Path(temp_dir, "a.mp3"), Path(temp_dir, "a_clean.mkv")),
+                (Path(temp_dir, "b.mp4"), Path(temp_dir, "b.mp3"), Path(temp_dir, "b_clean.mp4")),
+            ]
+            static_args = merger._static_merge_args("copy", True)
+            with mock.patch.object(merger, "run_process") as run_process:
+                run_process.side_effect = lambda args: subprocess.CompletedProcess(args, 0, None, b"")
+                outputs = merger._merge_in_one_process(jobs, static_args, True)
+            
+            probe = ["-probesize", "1M", "-analyzeduration", "1M"]
+            self.assertEqual(run_process.call_args[0][0], [
+                "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+                *probe, "-i", str(jobs[0][0]), *probe, "-i", str(jobs[0][1]),
+                *probe, "-i", str(jobs[1][0]), *probe, "-i", str(jobs[1][1]),
+                "-map", "0:v", "-map", "1:a", "-vcodec", "copy", "-map_metadata", "0",
+                "-acodec", "copy", str(jobs[0][2]),
+                "-map", "2:v", "-map", "3:a", "-vcodec", "copy", "-map_metadata", "2",
+                "-acodec", "copy", "-movflags", "+faststart", str(jobs[1][2]),
+            ])
+            self.assertEqual(outputs, [str(jobs[0][2]), str(jobs[1][2])])
+    
+    def test_failed_grouped_merge_removes_partial_outputs(self):
+        """Test that a failed grouped merge removes what it wrote and nothing else."""
+        import ffmpeg
+        import subprocess
+        from unittest import mock
+        from voice_isolator.video import merger
+        
+        def failing_run(args):
+            # ffmpeg got as far as writing every output before failing
+            for arg in args:
+                if "_clean" in arg:
+                    Path(arg).write_bytes(b"partial")
+            return subprocess.CompletedProcess(args, 1, None, b"boom")
+        
+        for overwrite in (False, True):
+            with tempfile.TemporaryDirectory() as temp_dir:
+                existing = Path(temp_dir, "a_clean.mkv")
+                existing.write_bytes(b"earlier output")
+                jobs = [
+                    (Path(temp_dir, "a.mkv"), Path(temp_dir, "a.mp3"), existing),
+                    (Path(temp_dir, "b.mkv"), Path(temp_dir, "b.mp3"), Path(temp_dir, "b_clean.mkv")),
+                ]
+                static_args = merger._static_merge_args("copy", overwrite)
+                
+                with mock.patch.object(merger, "run_process", side_effect=failing_run):
+                    with self.assertRaises(ffmpeg.Error):
+                        merger._merge_in_one_process(jobs, static_args, overwrite)
+                
+                # Without overwrite the existing output is diverted to a _new
+                # file and left intact; with it, ffmpeg truncated it
+                remaining = sorted(p.name for p in Path(temp_dir).iterdir())
+                self.assertEqual(remaining, [] if overwrite else ["a_clean.mkv"])
+                if not overwrite:
+                    self.assertEqual(existing.read_bytes(), b"earlier output")
+    
+    # Stand-in for ffmpeg: the extracting run writes fake audio to stdout and
+    # exits with STUB_EXTRACT_RC; the merging run creates STUB_OUTPUT at once,
+    # like ffmpeg does, and copies stdin into it
+    STUB_FFMPEG = (
+        "import os, sys\n"
+        "if 'pipe:1' in sys.argv:\n"
+        "    sys.stdout.buffer.write(b'extracted audio')\n"
+        "    sys.exit(int(os.environ['STUB_EXTRACT_RC']))\n"
+        "with open(os.environ['STUB_OUTPUT'], 'wb') as output:\n"
+        "    output.write(sys.stdin.buffer.read())\n"
+    )
+    
+    def _run_stream_pipeline(self, temp_dir, isolation, extract_rc=0):
+        """
+        Run process_video's streaming path with stubbed ffmpeg and API. The
+        started processes are left in self.processes.
+        """
+        import subprocess
+        from unittest import mock
+        from voice_isolator import processor
+        
+        video_path = Path(temp_dir, "clip.mp4")
+        video_path.write_bytes(b"video")
+        output_path = Path(temp_dir, "clip_clean.mp4")
+        
+        real_popen = subprocess.Popen
+        self.processes = []
+        
+        def stub_popen(args, **kwargs):
+            env = dict(os.environ, STUB_EXTRACT_RC=str(extract_rc), STUB_OUTPUT=str(output_path))
+            process = real_popen([sys.executable, "-c", self.STUB_FFMPEG, *args[1:]], env=env, **kwargs)
+            self.processes.append(process)
+            return process
+        
+        client = mock.Mock()
+        client.audio_isolation.audio_isolation.side_effect = isolation
+        
+        with mock.patch("subprocess.Popen", side_effect=stub_popen), \
+                mock.patch("voice_isolator.audio.isolator._get_client", return_value=client):
+            return processor.process_video(video_path, output_path, api_key="test-key")
+    
+    def test_stream_pipeline(self):
+        """Test that extracted audio is uploaded from the pipe and the response merged."""
+        uploads = []
+        
+        def isolation(audio, request_options):
+            uploads.append(audio.read())
+            yield b"isolated "
+            yield b"voice"
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output = self._run_stream_pipeline(temp_dir, isolation)
+            self.assertEqual(uploads, [b"extracted audio"])
+            self.assertEqual(Path(output).read_bytes(), b"isolated voice")
+            self.assertEqual([process.returncode for process in self.processes], [0, 0])
+    
+    def test_stream_pipeline_extraction_failure(self):
+        """Test that a merge is removed when extraction fails after it finished."""
+        import ffmpeg
+        
+        def isolation(audio, request_options):
+            audio.read()
+            yield b"isolated voice"
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with self.assertRaises(ffmpeg.Error):
+                self._run_stream_pipeline(temp_dir, isolation, extract_rc=1)
+            self.assertFalse(Path(temp_dir, "clip_clean.mp4").exists())
+    
+    def test_stream_pipeline_api_error(self):
+        """Test that an API error mid-stream kills ffmpeg and leaves no output."""
+        import time
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_path = Path(temp_dir, "clip_clean.mp4")
+            
+            def isolation(audio, request_options):
+                audio.read()
+                yield b"isolated "
+                # Fail once the merging ffmpeg has started writing its output
+                deadline = time.monotonic() + 10
+                while not output_path.exists() and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                raise RuntimeError("connection reset")
+            
+            with self.assertRaises(RuntimeError):
+                self._run_stream_pipeline(temp_dir, isolation)
+            self.assertFalse(Path(temp_dir, "clip_clean.mp4").exists())
+            # The merging ffmpeg was still waiting for audio, so it was killed
+            self.assertNotEqual(self.processes[-1].returncode, 0)
+            self.assertTrue(all(process.returncode is not None for process in self.processes))
+    
+    def test_merge_copies_compatible_audio(self):
+        """Test that audio is only re-encoded when the container can't hold it."""
+        from voice_isolator.video.merger import _audio_options
+        self.assertEqual(_audio_options(".mp3", ".mp4", None, "192k"), {"acodec": "copy"})
+        self.assertEqual(
+            _audio_options(".flac", ".mp4", None, "192k"),
+            {"acodec": "aac", "ab": "192k"}
+        )
+        self.assertEqual(
+            _audio_options(".mp3", ".mkv", "aac", "128k"),
+            {"acodec": "aac", "ab": "128k"}
+        )
+        self.assertEqual(
+            _audio_options(".mp3", ".webm", None, "192k"),
+            {"acodec": "libopus", "ab": "192k"}
+        )
 
 if __name__ == '__main__':
     unittest.main()
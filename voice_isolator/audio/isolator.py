@@ -7,21 +7,107 @@ This module handles the isolation of voice from audio files using the ElevenLabs
 
 import os
 import logging
+import functools
+import importlib.util
 from pathlib import Path
-from typing import Optional, Union, BinaryIO
+from typing import TYPE_CHECKING, Iterator, Optional, Union, BinaryIO
 
-from elevenlabs.client import ElevenLabs
-from dotenv import load_dotenv
+from ..utils.files import AUDIO_EXTENSIONS, find_files
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+# The ElevenLabs SDK (and httpx) are imported when a client is first needed,
+# so that importing this module (e.g. for the CLI's --help) stays cheap
+if TYPE_CHECKING:
+    from elevenlabs.client import ElevenLabs
+
+# Handlers are left to the application (see cli.py), so importing this
+# module never changes how a host program's logging is set up
 logger = logging.getLogger("voice_isolator.audio.isolator")
 
-# Load environment variables from .env file (for API key)
-load_dotenv()
+# Size of the chunks the isolated audio is downloaded in. The SDK defaults
+# to 1 KiB, which means thousands of tiny reads and writes per track.
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+
+# Buffer size for writing the isolated audio to disk
+WRITE_BUFFER_SIZE = 1 << 20
+
+# HTTP/2 lets concurrent requests share one TLS connection, but httpx only
+# supports it when the optional h2 package is installed
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def _get_api_key(api_key: Optional[str] = None) -> str:
+    """Return the given API key, falling back to the ELEVENLABS_API_KEY env var."""
+    if api_key is None:
+        api_key = os.environ.get("ELEVENLABS_API_KEY")
+        if not api_key:
+            raise ValueError(
+                "ElevenLabs API key not provided. Set ELEVENLABS_API_KEY environment variable or pass api_key parameter."
+            )
+    return api_key
+
+
+@functools.lru_cache(maxsize=4)
+def _get_client(api_key: str) -> "ElevenLabs":
+    """
+    Return a shared ElevenLabs client for an API key, so batches reuse one
+    connection pool instead of paying a TLS handshake per file. HTTP/2 is
+    used when available.
+    """
+    import httpx
+    from elevenlabs.client import ElevenLabs
+    
+    # httpx's default pool (20 keep-alive connections) is already more than
+    # the concurrent requests a batch makes
+    http_client = httpx.Client(http2=HTTP2_AVAILABLE, follow_redirects=True)
+    return ElevenLabs(api_key=api_key, httpx_client=http_client)
+
+
+class _UnsizedReader:
+    """
+    Wrap a non-seekable stream (e.g. a pipe) so it is uploaded with chunked
+    encoding; httpx would otherwise size it with fstat() and get 0.
+    """
+    
+    def __init__(self, stream: BinaryIO, name: str):
+        self._stream = stream
+        self.name = name
+    
+    def read(self, size: int = -1) -> bytes:
+        return self._stream.read(size)
+
+
+def isolate_voice_stream(
+    audio_file: BinaryIO,
+    api_key: Optional[str] = None,
+    filename: str = "audio.mp3"
+) -> Iterator[bytes]:
+    """
+    Isolate voice from an open audio file using ElevenLabs API.
+    
+    The request is sent when iteration starts, and the isolated audio is
+    yielded in chunks as it is downloaded. ``audio_file`` may be a pipe,
+    such as ffmpeg's stdout, in which case it is uploaded as it is read.
+    
+    Args:
+        audio_file: Binary file object containing the input audio
+        api_key: ElevenLabs API key (optional, will use env var if not provided)
+        filename: File name sent with a non-seekable upload (default: audio.mp3)
+        
+    Returns:
+        Iterator over chunks of the isolated voice audio
+    """
+    api_key = _get_api_key(api_key)
+    
+    # Reuse the ElevenLabs client (and its connections) for this key
+    client = _get_client(api_key)
+    
+    if not audio_file.seekable():
+        audio_file = _UnsizedReader(audio_file, filename)
+    
+    return client.audio_isolation.audio_isolation(
+        audio=audio_file,
+        request_options={"chunk_size": DOWNLOAD_CHUNK_SIZE}
+    )
 
 
 def isolate_voice(
@@ -46,40 +132,32 @@ def isolate_voice(
         raise FileNotFoundError(f"Audio file not found: {audio_path}")
     
     if output_path is None:
-        output_path = audio_path.with_stem(f"{audio_path.stem}_isolated")
+        output_path = audio_path.with_name(f"{audio_path.stem}_isolated{audio_path.suffix}")
     else:
         output_path = Path(output_path)
     
     # Get API key from environment if not provided
-    if api_key is None:
-        api_key = os.environ.get("ELEVENLABS_API_KEY")
-        if not api_key:
-            raise ValueError(
-                "ElevenLabs API key not provided. Set ELEVENLABS_API_KEY environment variable or pass api_key parameter."
-            )
-    
-    logger.info(f"Isolating voice from {audio_path}")
+    api_key = _get_api_key(api_key)
     
-    # Initialize ElevenLabs client
-    client = ElevenLabs(api_key=api_key)
+    logger.info("Isolating voice from %s", audio_path)
     
     # Process the audio file
     with open(audio_path, "rb") as audio_file:
-        isolated_audio = client.audio_isolation.audio_isolation(audio=audio_file)
+        isolated_audio = isolate_voice_stream(audio_file, api_key=api_key)
         
         # Save the isolated audio to the output file
-        with open(output_path, "wb") as output_file:
+        with open(output_path, "wb", buffering=WRITE_BUFFER_SIZE) as output_file:
             for chunk in isolated_audio:
                 output_file.write(chunk)
     
-    logger.info(f"Voice isolation successful: {output_path}")
+    logger.info("Voice isolation successful: %s", output_path)
     return str(output_path)
 
 
 def batch_isolate_voice(
     input_dir: Union[str, Path],
     output_dir: Optional[Union[str, Path]] = None,
-    audio_extensions: tuple = (".mp3", ".wav", ".m4a", ".aac", ".flac"),
+    audio_extensions: frozenset = AUDIO_EXTENSIONS,
     api_key: Optional[str] = None
 ) -> list:
     """
@@ -88,7 +166,7 @@ def batch_isolate_voice(
     Args:
         input_dir: Directory containing audio files
         output_dir: Directory to save isolated voice audio files (optional)
-        audio_extensions: Tuple of audio file extensions to process
+        audio_extensions: Set of audio file extensions to process
         api_key: ElevenLabs API key (optional, will use env var if not provided)
         
     Returns:
@@ -96,7 +174,7 @@ def batch_isolate_voice(
     """
     input_dir = Path(input_dir)
     
-    if not input_dir.exists() or not input_dir.is_dir():
+    if not input_dir.is_dir():
         raise NotADirectoryError(f"Input directory not found: {input_dir}")
     
     if output_dir is None:
@@ -108,16 +186,13 @@ def batch_isolate_voice(
     output_dir.mkdir(parents=True, exist_ok=True)
     
     # Find all audio files in the input directory
-    audio_files = [
-        f for f in input_dir.iterdir()
-        if f.is_file() and f.suffix.lower() in audio_extensions
-    ]
+    audio_files = find_files(input_dir, audio_extensions)
     
     if not audio_files:
-        logger.warning(f"No audio files found in {input_dir}")
+        logger.warning("No audio files found in %s", input_dir)
         return []
     
-    logger.info(f"Found {len(audio_files)} audio files to process")
+    logger.info("Found %d audio files to process", len(audio_files))
     
     # Process each audio file
     output_files = []
@@ -131,6 +206,6 @@ def batch_isolate_voice(
             )
             output_files.append(processed_file)
         except Exception as e:
-            logger.error(f"Error processing {audio_file}: {e}")
+            logger.error("Error processing %s: %s", audio_file, e)
     
     return output_files
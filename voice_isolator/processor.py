@@ -7,19 +7,67 @@ processing videos with ElevenLabs voice isolation.
 """
 
 import os
-import tempfile
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional, Union, List
 
-from .audio.isolator import isolate_voice
-from .video.extractor import extract_audio_from_video
-from .video.merger import merge_video_with_audio
+from .audio.isolator import isolate_voice, isolate_voice_stream
+from .video.extractor import extract_audio_from_video, extract_audio_stream
+from .video.merger import merge_video_with_audio, merge_video_with_audio_stream
+from .utils.files import VIDEO_EXTENSIONS, find_files
 from .utils.logger import setup_logger
 
 # Set up logger
 logger = setup_logger("voice_isolator.processor")
 
+# Format the audio is extracted to before isolation. FLAC is lossless, so
+# nothing is thrown away before the API sees it, and cheap to encode.
+EXTRACTED_AUDIO_FORMAT = "flac"
+
+
+def _process_video_via_files(
+    video_path: Path,
+    output_path: Path,
+    work_dir: Path,
+    api_key: Optional[str],
+    video_codec: str,
+    overwrite: bool
+) -> str:
+    """Run the three processing steps with intermediate files in `work_dir`."""
+    # `work_dir` may be shared by a whole batch, so the intermediate files are
+    # named after the extension too: clip.mp4 and clip.mov must not collide
+    stem, suffix = os.path.splitext(video_path.name)
+    temp_name = f"{stem}_{suffix[1:]}" if suffix else stem
+    extracted_audio_path = work_dir / f"{temp_name}.{EXTRACTED_AUDIO_FORMAT}"
+    isolated_audio_path = work_dir / f"{temp_name}_isolated.mp3"
+    
+    # Step 1: Extract audio from video
+    logger.info("Step 1: Extracting audio from video: %s", video_path)
+    extracted_audio_path = extract_audio_from_video(
+        video_path=video_path,
+        output_path=extracted_audio_path,
+        audio_format=EXTRACTED_AUDIO_FORMAT
+    )
+    
+    # Step 2: Isolate voice from the extracted audio
+    logger.info("Step 2: Isolating voice from audio: %s", extracted_audio_path)
+    isolate_voice(
+        audio_path=extracted_audio_path,
+        output_path=isolated_audio_path,
+        api_key=api_key
+    )
+    
+    # Step 3: Merge the isolated audio back with the original video
+    logger.info("Step 3: Merging isolated audio with video")
+    return merge_video_with_audio(
+        video_path=video_path,
+        audio_path=isolated_audio_path,
+        output_path=output_path,
+        video_codec=video_codec,
+        overwrite=overwrite
+    )
+
 
 def process_video(
     video_path: Union[str, Path],
@@ -27,7 +75,8 @@ def process_video(
     keep_temp_files: bool = False,
     api_key: Optional[str] = None,
     video_codec: str = "copy",
-    overwrite: bool = False
+    overwrite: bool = False,
+    temp_dir: Optional[Union[str, Path]] = None
 ) -> str:
     """
     Process a video by isolating voice and merging back with the video.
@@ -38,7 +87,9 @@ def process_video(
         keep_temp_files: Whether to keep temporary files (default: False)
         api_key: ElevenLabs API key (optional, will use env var if not provided)
         video_codec: Video codec to use (default: copy - no re-encoding)
-        overwrite: Whether to overwrite output files if they exist (default: False)
+        overwrite: Whether to overwrite the output file if it exists; otherwise
+            an existing output is returned as is (default: False)
+        temp_dir: Directory to keep temporary files in (default: temp_files next to the video)
         
     Returns:
         Path to the processed video file
@@ -50,64 +101,71 @@ def process_video(
     
     # Default output path if not specified
     if output_path is None:
-        output_path = video_path.with_stem(f"{video_path.stem}_clean")
+        output_path = video_path.with_name(f"{video_path.stem}_clean{video_path.suffix}")
     else:
         output_path = Path(output_path)
     
-    # Create a temporary directory for intermediate files
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_dir_path = Path(temp_dir)
-        
-        # Step 1: Extract audio from video
-        logger.info(f"Step 1: Extracting audio from video: {video_path}")
-        extracted_audio_path = extract_audio_from_video(
-            video_path=video_path,
-            output_path=temp_dir_path / f"{video_path.stem}.mp3"
-        )
-        
-        # Step 2: Isolate voice from the extracted audio
-        logger.info(f"Step 2: Isolating voice from audio: {extracted_audio_path}")
-        isolated_audio_path = isolate_voice(
-            audio_path=extracted_audio_path,
-            output_path=temp_dir_path / f"{video_path.stem}_isolated.mp3",
-            api_key=api_key
-        )
-        
-        # Step 3: Merge the isolated audio back with the original video
-        logger.info(f"Step 3: Merging isolated audio with video")
-        final_video_path = merge_video_with_audio(
-            video_path=video_path,
-            audio_path=isolated_audio_path,
-            output_path=output_path,
-            video_codec=video_codec,
-            overwrite=overwrite
-        )
-        
-        # Keep temporary files if requested
-        if keep_temp_files:
-            import shutil
-            temp_files_dir = video_path.parent / "temp_files"
-            temp_files_dir.mkdir(exist_ok=True)
-            
-            # Copy temp files to the temp_files directory
-            shutil.copy2(extracted_audio_path, temp_files_dir / Path(extracted_audio_path).name)
-            shutil.copy2(isolated_audio_path, temp_files_dir / Path(isolated_audio_path).name)
-            
-            logger.info(f"Temporary files saved to: {temp_files_dir}")
+    # Don't pay for extraction and an API call just to not write the result
+    if output_path.exists() and not overwrite:
+        logger.info("Skipping existing output: %s", output_path)
+        return str(output_path)
+    
+    # Without temp files to keep, pipe everything: ffmpeg extracts the audio
+    # to stdout, which is uploaded as it is read, and the API response is fed
+    # straight into the merging ffmpeg
+    if not keep_temp_files:
+        logger.info("Step 1: Extracting audio from video: %s", video_path)
+        final_video_path = None
+        try:
+            with extract_audio_stream(video_path, audio_format=EXTRACTED_AUDIO_FORMAT) as audio_stream:
+                logger.info("Step 2: Isolating voice from extracted audio")
+                logger.info("Step 3: Merging isolated audio with video")
+                final_video_path = merge_video_with_audio_stream(
+                    video_path=video_path,
+                    audio_chunks=isolate_voice_stream(
+                        audio_stream,
+                        api_key=api_key,
+                        filename=f"{video_path.stem}.{EXTRACTED_AUDIO_FORMAT}"
+                    ),
+                    output_path=output_path,
+                    video_codec=video_codec,
+                    overwrite=overwrite
+                )
+        except BaseException:
+            # The merge can finish before the extracting ffmpeg reports a
+            # failure, in which case the video holds truncated audio. Don't
+            # leave it to be skipped as done on the next run.
+            if final_video_path is not None and Path(final_video_path).exists():
+                Path(final_video_path).unlink()
+            raise
         
-        logger.info(f"Video processing successful: {final_video_path}")
+        logger.info("Video processing successful: %s", final_video_path)
         return str(final_video_path)
+    
+    # Write the temporary files straight into the directory they are kept
+    # in (possibly shared by a whole batch), so nothing needs copying after
+    temp_dir = Path(temp_dir) if temp_dir is not None else video_path.parent / "temp_files"
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    
+    final_video_path = _process_video_via_files(
+        video_path, output_path, temp_dir, api_key, video_codec, overwrite
+    )
+    
+    logger.info("Temporary files saved to: %s", temp_dir)
+    logger.info("Video processing successful: %s", final_video_path)
+    return str(final_video_path)
 
 
 def batch_process_videos(
     input_dir: Union[str, Path],
     output_dir: Optional[Union[str, Path]] = None,
     temp_dir: Optional[Union[str, Path]] = None,
-    video_extensions: tuple = (".mp4", ".avi", ".mov", ".mkv", ".webm"),
+    video_extensions: frozenset = VIDEO_EXTENSIONS,
     api_key: Optional[str] = None,
     video_codec: str = "copy",
     keep_temp_files: bool = False,
-    overwrite: bool = False
+    overwrite: bool = False,
+    concurrency: int = 1
 ) -> List[str]:
     """
     Batch process videos by isolating voice and merging back with the videos.
@@ -116,18 +174,20 @@ def batch_process_videos(
         input_dir: Directory containing video files
         output_dir: Directory to save processed videos (optional)
         temp_dir: Directory for temporary files (optional)
-        video_extensions: Tuple of video file extensions to process
+        video_extensions: Set of video file extensions to process
         api_key: ElevenLabs API key (optional, will use env var if not provided)
         video_codec: Video codec to use (default: copy - no re-encoding)
         keep_temp_files: Whether to keep temporary files (default: False)
-        overwrite: Whether to overwrite output files if they exist (default: False)
+        overwrite: Whether to overwrite output files if they exist; otherwise
+            videos with an existing output are skipped (default: False)
+        concurrency: Number of videos to process at the same time (default: 1)
         
     Returns:
         List of paths to the processed video files
     """
     input_dir = Path(input_dir)
     
-    if not input_dir.exists() or not input_dir.is_dir():
+    if not input_dir.is_dir():
         raise NotADirectoryError(f"Input directory not found: {input_dir}")
     
     # Default output directory if not specified
@@ -139,38 +199,52 @@ def batch_process_videos(
     # Create output directory if it doesn't exist
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    # Create or use specified temp directory
+    # Create or use specified temp directory, shared by every video in the batch
     if temp_dir is None and keep_temp_files:
         temp_dir = input_dir / "temp_files"
         temp_dir.mkdir(parents=True, exist_ok=True)
     
     # Find all video files in the input directory
-    video_files = [
-        f for f in input_dir.iterdir()
-        if f.is_file() and f.suffix.lower() in video_extensions
-    ]
+    video_files = find_files(input_dir, video_extensions)
     
     if not video_files:
-        logger.warning(f"No video files found in {input_dir}")
+        logger.warning("No video files found in %s", input_dir)
         return []
     
-    logger.info(f"Found {len(video_files)} video files to process")
+    logger.info("Found %d video files to process", len(video_files))
     
-    # Process each video file
-    output_files = []
-    for video_file in video_files:
+    def _process(video_file: Path) -> str:
         output_file = output_dir / f"{video_file.stem}_clean{video_file.suffix}"
+        if output_file.exists() and not overwrite:
+            logger.info("Skipping existing output: %s", output_file)
+            return str(output_file)
+        return process_video(
+            video_path=video_file,
+            output_path=output_file,
+            keep_temp_files=keep_temp_files,
+            api_key=api_key,
+            video_codec=video_codec,
+            overwrite=overwrite,
+            temp_dir=temp_dir
+        )
+    
+    # Process the video files, keeping up to `concurrency` of them in flight.
+    # Each job mostly waits on ffmpeg or the ElevenLabs API, so threads are enough.
+    output_files = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {video_file: executor.submit(_process, video_file) for video_file in video_files}
         try:
-            processed_file = process_video(
-                video_path=video_file,
-                output_path=output_file,
-                keep_temp_files=keep_temp_files,
-                api_key=api_key,
-                video_codec=video_codec,
-                overwrite=overwrite
-            )
-            output_files.append(processed_file)
-        except Exception as e:
-            logger.error(f"Error processing {video_file}: {e}")
+            for video_file, future in futures.items():
+                try:
+                    output_files.append(future.result())
+                except Exception as e:
+                    logger.error("Error processing %s: %s", video_file, e)
+        except BaseException:
+            # On Ctrl-C, don't let the pool start the queued videos (each one
+            # a paid API call) before the interrupt gets through; only those
+            # already running are waited for
+            for future in futures.values():
+                future.cancel()
+            raise
     
     return output_files
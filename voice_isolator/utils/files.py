@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+File Discovery Module
+
+This module provides helpers for finding media files to process.
+"""
+
+import os
+from pathlib import Path
+from typing import Iterable, List, Union
+
+# Default file extensions picked up by the batch functions
+VIDEO_EXTENSIONS = frozenset({".mp4", ".avi", ".mov", ".mkv", ".webm"})
+AUDIO_EXTENSIONS = frozenset({".mp3", ".wav", ".m4a", ".aac", ".flac"})
+
+
+def find_files(
+    directory: Union[str, Path],
+    extensions: Iterable[str]
+) -> List[Path]:
+    """
+    Find the files in a directory with one of the given extensions.
+    
+    Uses os.scandir, whose entries carry the file type from the directory
+    listing, so no extra stat() call is needed per entry.
+    
+    Args:
+        directory: Directory to search (not recursive)
+        extensions: File extensions to match, e.g. (".mp4", ".mov")
+        
+    Returns:
+        List of paths to the matching files
+    """
+    extensions = frozenset(ext.lower() for ext in extensions)
+    
+    with os.scandir(directory) as entries:
+        return [
+            Path(entry.path) for entry in entries
+            if os.path.splitext(entry.name)[1].lower() in extensions and entry.is_file()
+        ]
@@ -31,8 +31,11 @@ def setup_logger(
     if log_format is None:
         log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     
-    # Create logger
+    # Create logger, or reuse it if it was already set up, so repeated calls
+    # don't stack up handlers and emit every record more than once
     logger = logging.getLogger(name)
+    if logger.handlers:
+        return logger
     logger.setLevel(level)
     
     # Create console handler
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Subprocess Utility Module
+
+This module provides helpers for running ffmpeg child processes safely.
+"""
+
+import collections
+import subprocess
+import threading
+from typing import BinaryIO, List
+
+
+class StderrDrain:
+    """
+    Read a child process's stderr on a background thread.
+    
+    Only the last `max_lines` lines are kept, so a chatty process can neither
+    fill the pipe and stall (deadlocking whoever is feeding or reading its
+    other pipes) nor make memory grow without bound.
+    """
+    
+    def __init__(self, stream: BinaryIO, max_lines: int = 200):
+        self._lines = collections.deque(maxlen=max_lines)
+        self._thread = threading.Thread(target=self._drain, args=(stream,), daemon=True)
+        self._thread.start()
+    
+    def _drain(self, stream: BinaryIO) -> None:
+        with stream:
+            for line in iter(stream.readline, b""):
+                self._lines.append(line)
+    
+    def output(self) -> bytes:
+        """Wait for stderr to close and return the lines that were kept."""
+        self._thread.join()
+        return b"".join(self._lines)
+
+
+def stderr_tail(stderr: bytes, limit: int = 4096) -> str:
+    """
+    Decode the last `limit` bytes of a process's stderr for logging.
+    
+    The end of ffmpeg's output is where the error is, and decoding only that
+    keeps failures cheap however much was captured. Undecodable bytes (e.g.
+    a multibyte character cut in half) are replaced rather than raising.
+    """
+    return stderr[-limit:].decode(errors="replace")
+
+
+def run_process(args: List[str]) -> subprocess.CompletedProcess:
+    """
+    Run a command to completion, discarding stdout and keeping the tail of
+    stderr.
+    
+    Args:
+        args: Command line to run
+        
+    Returns:
+        CompletedProcess with the return code and the kept stderr
+    """
+    process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = StderrDrain(process.stderr)
+    process.wait()
+    return subprocess.CompletedProcess(args, process.returncode, None, stderr.output())
@@ -6,18 +6,58 @@ This module handles the extraction of audio from video files using FFmpeg.
 """
 
 import logging
+import subprocess
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Union
+from typing import BinaryIO, Iterator, Optional, Union
 
-import ffmpeg
+from ..utils.files import VIDEO_EXTENSIONS, find_files
+from ..utils.process import StderrDrain, run_process, stderr_tail
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+# Handlers are left to the application (see cli.py), so importing this
+# module never changes how a host program's logging is set up
 logger = logging.getLogger("voice_isolator.video.extractor")
 
+# ffmpeg-python is imported in the functions that use it, so that importing
+# this module (e.g. for the CLI's --help) stays cheap
+
+# ffmpeg output options for each extraction format. FLAC and WAV are
+# lossless and far cheaper to encode than MP3; other formats get ffmpeg's
+# default codec for the container.
+AUDIO_FORMAT_OPTIONS = {
+    "mp3": {"acodec": "libmp3lame", "ab": "192k"},
+    "flac": {"acodec": "flac", "compression_level": 0},
+    "wav": {"acodec": "pcm_s16le"},
+}
+
+
+def _audio_output(video_path: Path, target: str, audio_format: str, **kwargs):
+    """
+    Build the ffmpeg command for writing the first audio stream to `target`.
+    
+    Only that stream is mapped and video, subtitle and data streams are
+    disabled, so ffmpeg never has to parse packets it would discard. ffmpeg
+    picks its own thread count for decoding and never reads from stdin.
+    """
+    import ffmpeg
+    
+    return (
+        ffmpeg
+        .input(str(video_path))
+        ["a:0"]
+        .output(
+            target,
+            ac=2,
+            vn=None,
+            sn=None,
+            dn=None,
+            threads=0,
+            **AUDIO_FORMAT_OPTIONS.get(audio_format, {}),
+            **kwargs
+        )
+        .global_args("-nostdin", "-hide_banner", "-loglevel", "error")
+    )
+
 
 def extract_audio_from_video(
     video_path: Union[str, Path],
@@ -45,28 +85,85 @@ def extract_audio_from_video(
     else:
         output_path = Path(output_path)
     
-    logger.info(f"Extracting audio from {video_path} to {output_path}")
+    logger.info("Extracting audio from %s to %s", video_path, output_path)
+    
+    import ffmpeg
     
     try:
-        (
-            ffmpeg
-            .input(str(video_path))
-            .output(str(output_path), acodec="libmp3lame", ab="192k", ac=2)
-            .global_args("-loglevel", "error")
+        args = (
+            _audio_output(video_path, str(output_path), audio_format)
             .global_args("-y")
-            .run(capture_stdout=True, capture_stderr=True)
+            .compile()
         )
-        logger.info(f"Audio extraction successful: {output_path}")
+        result = run_process(args)
+        if result.returncode != 0:
+            raise ffmpeg.Error("ffmpeg", None, result.stderr)
+        logger.info("Audio extraction successful: %s", output_path)
         return str(output_path)
     except ffmpeg.Error as e:
-        logger.error(f"Error extracting audio: {e.stderr.decode()}")
+        logger.error("Error extracting audio: %s", stderr_tail(e.stderr))
         raise
 
 
+@contextmanager
+def extract_audio_stream(
+    video_path: Union[str, Path],
+    audio_format: str = "mp3"
+) -> Iterator[BinaryIO]:
+    """
+    Extract audio from a video file using ffmpeg, writing it to a pipe
+    instead of a file.
+    
+    Use as a context manager; the yielded stream is ffmpeg's stdout. On exit
+    ffmpeg is waited for and ffmpeg.Error is raised if it failed.
+    
+    Args:
+        video_path: Path to the input video file
+        audio_format: Format of the extracted audio stream (default: mp3)
+        
+    Yields:
+        Readable binary stream of the extracted audio
+    """
+    video_path = Path(video_path)
+    
+    if not video_path.exists():
+        raise FileNotFoundError(f"Video file not found: {video_path}")
+    
+    logger.info("Extracting audio from %s to a pipe", video_path)
+    
+    import ffmpeg
+    
+    args = (
+        _audio_output(video_path, "pipe:1", audio_format, format=audio_format)
+        .compile()
+    )
+    process = subprocess.Popen(
+        args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=1 << 20
+    )
+    stderr_drain = StderrDrain(process.stderr)
+    try:
+        yield process.stdout
+    except BaseException:
+        # If ffmpeg failed first, that is likely why the consumer failed too
+        if process.poll():
+            logger.error("Error extracting audio: %s", stderr_tail(stderr_drain.output()))
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        process.stdout.close()
+    
+    process.wait()
+    if process.returncode != 0:
+        stderr = stderr_drain.output()
+        logger.error("Error extracting audio: %s", stderr_tail(stderr))
+        raise ffmpeg.Error("ffmpeg", None, stderr)
+
+
 def batch_extract_audio(
     input_dir: Union[str, Path],
     output_dir: Optional[Union[str, Path]] = None,
-    video_extensions: tuple = (".mp4", ".avi", ".mov", ".mkv", ".webm"),
+    video_extensions: frozenset = VIDEO_EXTENSIONS,
     audio_format: str = "mp3"
 ) -> list:
     """
@@ -75,7 +172,7 @@ def batch_extract_audio(
     Args:
         input_dir: Directory containing video files
         output_dir: Directory to save extracted audio files (optional)
-        video_extensions: Tuple of video file extensions to process
+        video_extensions: Set of video file extensions to process
         audio_format: Format of the output audio files (default: mp3)
         
     Returns:
@@ -83,7 +180,7 @@ def batch_extract_audio(
     """
     input_dir = Path(input_dir)
     
-    if not input_dir.exists() or not input_dir.is_dir():
+    if not input_dir.is_dir():
         raise NotADirectoryError(f"Input directory not found: {input_dir}")
     
     if output_dir is None:
@@ -95,16 +192,13 @@ def batch_extract_audio(
     output_dir.mkdir(parents=True, exist_ok=True)
     
     # Find all video files in the input directory
-    video_files = [
-        f for f in input_dir.iterdir()
-        if f.is_file() and f.suffix.lower() in video_extensions
-    ]
+    video_files = find_files(input_dir, video_extensions)
     
     if not video_files:
-        logger.warning(f"No video files found in {input_dir}")
+        logger.warning("No video files found in %s", input_dir)
         return []
     
-    logger.info(f"Found {len(video_files)} video files to process")
+    logger.info("Found %d video files to process", len(video_files))
     
     # Process each video file
     output_files = []
@@ -118,6 +212,6 @@ def batch_extract_audio(
             )
             output_files.append(extracted_file)
         except Exception as e:
-            logger.error(f"Error processing {video_file}: {e}")
+            logger.error("Error processing %s: %s", video_file, e)
     
     return output_files
@@ -7,27 +7,130 @@ of the original audio track with a processed/cleaned audio track.
 """
 
 import logging
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Union
+from typing import BinaryIO, Iterable, List, Optional, Tuple, Union
 
-import ffmpeg
+from ..utils.files import VIDEO_EXTENSIONS, find_files
+from ..utils.process import StderrDrain, run_process, stderr_tail
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+# Handlers are left to the application (see cli.py), so importing this
+# module never changes how a host program's logging is set up
 logger = logging.getLogger("voice_isolator.video.merger")
 
+# ffmpeg-python is imported in the functions that use it, so that importing
+# this module (e.g. for the CLI's --help) stays cheap
+
+# Read size for audio file objects streamed to ffmpeg
+STREAM_CHUNK_SIZE = 1 << 16
+
+# Audio file types each output container can take without re-encoding
+COPYABLE_AUDIO = {
+    ".mp4": {".mp3", ".aac", ".m4a"},
+    ".mov": {".mp3", ".aac", ".m4a"},
+    ".mkv": {".mp3", ".aac", ".m4a", ".flac", ".ogg", ".opus", ".wav"},
+    ".avi": {".mp3", ".wav"},
+    ".webm": {".ogg", ".opus"},
+}
+
+# Codec audio is re-encoded to for containers where AAC isn't the natural
+# (or, for WebM, an allowed) choice; everything else gets AAC
+AUDIO_ENCODERS = {
+    ".webm": "libopus",
+    ".avi": "libmp3lame",
+}
+
+# Containers that need raw ADTS AAC repackaged when it is stream-copied
+ADTS_TO_ASC = {".mp4", ".mov"}
+
+
+def _probe_options(probesize: Optional[str], analyzeduration: Optional[str]) -> dict:
+    """Input options limiting how much ffmpeg reads before it starts muxing."""
+    options = {}
+    if probesize is not None:
+        options["probesize"] = probesize
+    if analyzeduration is not None:
+        options["analyzeduration"] = analyzeduration
+    return options
+
+
+def _audio_options(
+    audio_suffix: str,
+    output_suffix: str,
+    audio_codec: Optional[str],
+    audio_bitrate: str
+) -> dict:
+    """
+    Pick the ffmpeg audio options for a merge.
+    
+    Without an explicit codec, the audio is stream-copied when the output
+    container can hold it as-is, turning the merge into a pure remux, and
+    otherwise re-encoded to the container's codec from AUDIO_ENCODERS
+    (AAC by default).
+    """
+    audio_suffix = audio_suffix.lower()
+    output_suffix = output_suffix.lower()
+    
+    if audio_codec is None:
+        if audio_suffix in COPYABLE_AUDIO.get(output_suffix, ()):
+            audio_codec = "copy"
+        else:
+            audio_codec = AUDIO_ENCODERS.get(output_suffix, "aac")
+    
+    if audio_codec == "copy":
+        if audio_suffix == ".aac" and output_suffix in ADTS_TO_ASC:
+            return {"acodec": "copy", "bsf:a": "aac_adtstoasc"}
+        return {"acodec": "copy"}
+    return {"acodec": audio_codec, "ab": audio_bitrate}
+
+
+def _container_options(output_suffix: str) -> dict:
+    """
+    Extra ffmpeg output options for the output container.
+    
+    MP4 and MOV get their index (moov atom) moved to the front, so players
+    can start before the whole file has downloaded.
+    """
+    if output_suffix.lower() in (".mp4", ".mov"):
+        return {"movflags": "+faststart"}
+    return {}
+
+
+def _resolve_output_path(
+    video_path: Path,
+    output_path: Optional[Union[str, Path]],
+    overwrite: bool
+) -> Path:
+    """Work out where the merged video goes, avoiding clobbering unless asked."""
+    if output_path is None:
+        stem, suffix = os.path.splitext(video_path.name)
+        output_path = video_path.parent / f"{stem}_clean{suffix}"
+    else:
+        output_path = Path(output_path)
+    
+    # Check if output file exists and handle accordingly
+    if output_path.exists() and not overwrite:
+        logger.warning("Output file already exists: %s", output_path)
+        stem, suffix = os.path.splitext(output_path.name)
+        output_path = output_path.parent / f"{stem}_new{suffix}"
+        logger.info("Using new output path: %s", output_path)
+    
+    return output_path
+
 
 def merge_video_with_audio(
     video_path: Union[str, Path],
     audio_path: Union[str, Path],
     output_path: Optional[Union[str, Path]] = None,
     video_codec: str = "copy",
-    audio_codec: str = "aac",
+    audio_codec: Optional[str] = None,
     audio_bitrate: str = "192k",
-    overwrite: bool = False
+    overwrite: bool = False,
+    probesize: Optional[str] = "1M",
+    analyzeduration: Optional[str] = "1M",
+    threads: Optional[int] = None
 ) -> str:
     """
     Merge a video file with an audio file, replacing the original audio track.
@@ -37,9 +140,16 @@ def merge_video_with_audio(
         audio_path: Path to the audio file to merge with the video
         output_path: Path to save the merged video (optional)
         video_codec: Video codec to use (default: copy - no re-encoding)
-        audio_codec: Audio codec to use (default: aac)
-        audio_bitrate: Audio bitrate for the output file (default: 192k)
+        audio_codec: Audio codec to use (default: copy if the output container
+            supports the audio as-is, otherwise aac)
+        audio_bitrate: Audio bitrate when re-encoding the audio (default: 192k)
         overwrite: Whether to overwrite the output file if it exists (default: False)
+        probesize: Bytes ffmpeg reads from each input to detect its streams;
+            None uses ffmpeg's default of 5M (default: 1M)
+        analyzeduration: Microseconds of each input ffmpeg analyzes before
+            muxing; None uses ffmpeg's default of 5s (default: 1M = 1s)
+        threads: Number of threads ffmpeg may use; None lets ffmpeg decide,
+            which is one per CPU when re-encoding (default: None)
         
     Returns:
         Path to the merged video file
@@ -53,59 +163,293 @@ def merge_video_with_audio(
     if not audio_path.exists():
         raise FileNotFoundError(f"Audio file not found: {audio_path}")
     
-    if output_path is None:
-        output_path = video_path.with_stem(f"{video_path.stem}_clean")
-    else:
-        output_path = Path(output_path)
+    output_path = _resolve_output_path(video_path, output_path, overwrite)
     
-    # Check if output file exists and handle accordingly
-    if output_path.exists() and not overwrite:
-        logger.warning(f"Output file already exists: {output_path}")
-        output_path = output_path.with_stem(f"{output_path.stem}_new")
-        logger.info(f"Using new output path: {output_path}")
+    # Convert each path once, for both ffmpeg and the log messages
+    video_str = os.fspath(video_path)
+    audio_str = os.fspath(audio_path)
+    output_str = os.fspath(output_path)
     
-    logger.info(f"Merging video {video_path} with audio {audio_path} to {output_path}")
+    logger.info("Merging video %s with audio %s to %s", video_str, audio_str, output_str)
+    
+    import ffmpeg
     
     try:
+        # Inputs are only probed briefly, since all we do is remux them
+        probe_options = _probe_options(probesize, analyzeduration)
         # Input video
-        video_input = ffmpeg.input(str(video_path))
+        video_input = ffmpeg.input(video_str, **probe_options)
         # Input audio
-        audio_input = ffmpeg.input(str(audio_path))
+        audio_input = ffmpeg.input(audio_str, **probe_options)
         
         # Create the output with video from original and audio from processed file
         global_args = ["-y"] if overwrite else []
+        thread_options = {"threads": threads} if threads is not None else {}
         
-        (
+        args = (
             ffmpeg
             .output(
                 video_input.video,
                 audio_input.audio,
-                str(output_path),
+                output_str,
                 vcodec=video_codec,
-                acodec=audio_codec,
-                ab=audio_bitrate,
-                map_metadata=0
+                map_metadata=0,
+                **_audio_options(audio_path.suffix, output_path.suffix, audio_codec, audio_bitrate),
+                **_container_options(output_path.suffix),
+                **thread_options
             )
-            .global_args("-loglevel", "error")
+            .global_args("-nostdin", "-loglevel", "error")
             .global_args(*global_args)
-            .run(capture_stdout=True, capture_stderr=True)
+            .compile()
         )
+        # ffmpeg writes nothing useful to stdout, so only (the tail of) its
+        # stderr is kept
+        result = run_process(args)
+        if result.returncode != 0:
+            raise ffmpeg.Error("ffmpeg", None, result.stderr)
         
-        logger.info(f"Successfully merged video and audio: {output_path}")
-        return str(output_path)
+        logger.info("Successfully merged video and audio: %s", output_str)
+        return output_str
     
     except ffmpeg.Error as e:
-        logger.error(f"Error merging video and audio: {e.stderr.decode()}")
+        logger.error("Error merging video and audio: %s", stderr_tail(e.stderr))
         raise
 
 
+def merge_video_with_audio_stream(
+    video_path: Union[str, Path],
+    audio_chunks: Union[Iterable[bytes], BinaryIO],
+    output_path: Optional[Union[str, Path]] = None,
+    video_codec: str = "copy",
+    audio_codec: Optional[str] = None,
+    audio_bitrate: str = "192k",
+    overwrite: bool = False,
+    audio_format: str = "mp3",
+    probesize: Optional[str] = "1M",
+    analyzeduration: Optional[str] = "1M"
+) -> str:
+    """
+    Merge a video file with audio fed through ffmpeg's stdin, replacing the
+    original audio track without writing the audio to disk first.
+    
+    Args:
+        video_path: Path to the input video file
+        audio_chunks: Iterable of encoded audio bytes (e.g. an API response),
+            or a binary file object; one backed by a file descriptor, such as
+            another process's stdout, is handed to ffmpeg as its stdin
+        output_path: Path to save the merged video (optional)
+        video_codec: Video codec to use (default: copy - no re-encoding)
+        audio_codec: Audio codec to use (default: copy if the output container
+            supports the audio as-is, otherwise aac)
+        audio_bitrate: Audio bitrate when re-encoding the audio (default: 192k)
+        overwrite: Whether to overwrite the output file if it exists (default: False)
+        audio_format: Format of the streamed audio (default: mp3)
+        probesize: Bytes ffmpeg reads from each input to detect its streams;
+            None uses ffmpeg's default of 5M (default: 1M)
+        analyzeduration: Microseconds of each input ffmpeg analyzes before
+            muxing; None uses ffmpeg's default of 5s (default: 1M = 1s)
+        
+    Returns:
+        Path to the merged video file
+    """
+    video_path = Path(video_path)
+    
+    if not video_path.exists():
+        raise FileNotFoundError(f"Video file not found: {video_path}")
+    
+    output_path = _resolve_output_path(video_path, output_path, overwrite)
+    
+    logger.info("Merging video %s with streamed audio to %s", video_path, output_path)
+    
+    import ffmpeg
+    
+    probe_options = _probe_options(probesize, analyzeduration)
+    video_input = ffmpeg.input(str(video_path), **probe_options)
+    audio_input = ffmpeg.input("pipe:0", **probe_options)
+    global_args = ["-y"] if overwrite else []
+    
+    args = (
+        ffmpeg
+        .output(
+            video_input.video,
+            audio_input.audio,
+            str(output_path),
+            vcodec=video_codec,
+            map_metadata=0,
+            **_audio_options(f".{audio_format}", output_path.suffix, audio_codec, audio_bitrate),
+            **_container_options(output_path.suffix)
+        )
+        .global_args("-loglevel", "error")
+        .global_args(*global_args)
+        .compile()
+    )
+    
+    # A file object with a descriptor becomes ffmpeg's stdin, so the audio
+    # never passes through Python; any other file object is read in chunks
+    audio_fd = None
+    if hasattr(audio_chunks, "read"):
+        try:
+            audio_fd = audio_chunks.fileno()
+        except (AttributeError, OSError):
+            audio_file = audio_chunks
+            audio_chunks = iter(lambda: audio_file.read(STREAM_CHUNK_SIZE), b"")
+    
+    # ffmpeg writes the output while the audio is still arriving, so a failed
+    # merge leaves a truncated file that must not pass for a finished one.
+    # Remove it unless it was there before and ffmpeg never touched it.
+    remove_on_failure = overwrite or not output_path.exists()
+    
+    # Start ffmpeg before pulling the first chunk: for a lazy source such as
+    # an API response, its startup and probing of the video overlap the
+    # upload. A large pipe buffer keeps write() calls per track few.
+    process = subprocess.Popen(
+        args,
+        stdin=audio_fd if audio_fd is not None else subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        bufsize=1 << 20
+    )
+    stderr_drain = StderrDrain(process.stderr)
+    try:
+        if audio_fd is None:
+            try:
+                for chunk in audio_chunks:
+                    process.stdin.write(chunk)
+                process.stdin.close()
+            except BrokenPipeError:
+                # ffmpeg exited early; its stderr below says why. Closing
+                # may hit the broken pipe again flushing what was buffered,
+                # but the pipe is closed either way.
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+        process.wait()
+    except BaseException:
+        process.kill()
+        process.wait()
+        if remove_on_failure and output_path.exists():
+            output_path.unlink()
+        raise
+    
+    if process.returncode != 0:
+        if remove_on_failure and output_path.exists():
+            output_path.unlink()
+        stderr = stderr_drain.output()
+        logger.error("Error merging video and audio: %s", stderr_tail(stderr))
+        raise ffmpeg.Error("ffmpeg", None, stderr)
+    
+    logger.info("Successfully merged video and audio: %s", output_path)
+    return str(output_path)
+
+
+def _static_merge_args(
+    video_codec: str,
+    overwrite: bool,
+    threads: Optional[int] = None,
+    probesize: Optional[str] = "1M",
+    analyzeduration: Optional[str] = "1M"
+) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Build the parts of a raw merge command that are the same for every pair
+    in a batch: the global arguments, the options given before each input and
+    the video options given for each output.
+    """
+    global_args = ["-nostdin", "-loglevel", "error"] + (["-y"] if overwrite else [])
+    
+    input_args = []
+    for name, value in _probe_options(probesize, analyzeduration).items():
+        input_args += [f"-{name}", value]
+    
+    output_args = ["-vcodec", video_codec]
+    if threads is not None:
+        output_args += ["-threads", str(threads)]
+    
+    return global_args, input_args, output_args
+
+
+def _merge_in_one_process(
+    jobs: List[Tuple[Path, Path, Path]],
+    static_args: Tuple[List[str], List[str], List[str]],
+    overwrite: bool
+) -> List[str]:
+    """
+    Merge (video, audio, output) triples with a single ffmpeg run.
+    
+    The command is assembled directly from `static_args` (see
+    _static_merge_args, called with the same `overwrite`), built once per
+    batch, rather than through an ffmpeg-python graph per file. Every pair becomes two inputs and one
+    output of the same command, so for a group ffmpeg's startup and codec
+    initialisation are paid once. If ffmpeg fails, any partial outputs it
+    wrote are removed and ffmpeg.Error is raised for the whole group.
+    """
+    import ffmpeg
+    
+    global_args, probe_args, video_args = static_args
+    
+    input_args = []
+    output_args = []
+    output_strs = []
+    written_paths = []
+    for index, (video_path, audio_path, output_path) in enumerate(jobs):
+        output_path = _resolve_output_path(video_path, output_path, overwrite)
+        output_strs.append(os.fspath(output_path))
+        # With -y an existing output is truncated as soon as ffmpeg starts, so
+        # on failure it is removed just like one this run created
+        if overwrite or not output_path.exists():
+            written_paths.append(output_path)
+        
+        input_args += [
+            *probe_args, "-i", os.fspath(video_path),
+            *probe_args, "-i", os.fspath(audio_path)
+        ]
+        
+        output_args += [
+            "-map", f"{2 * index}:v",
+            "-map", f"{2 * index + 1}:a",
+            *video_args,
+            "-map_metadata", str(2 * index),
+        ]
+        options = {
+            **_audio_options(audio_path.suffix, output_path.suffix, None, "192k"),
+            **_container_options(output_path.suffix)
+        }
+        for name, value in options.items():
+            output_args += [f"-{name}", value]
+        output_args.append(output_strs[-1])
+    
+    if len(jobs) == 1:
+        video_path, audio_path, _ = jobs[0]
+        logger.info("Merging video %s with audio %s to %s", video_path, audio_path, output_strs[0])
+    else:
+        logger.info("Merging %d videos with their audio in one ffmpeg process", len(jobs))
+    
+    result = run_process(["ffmpeg", *global_args, *input_args, *output_args])
+    if result.returncode != 0:
+        # Remove the partial outputs, leaving files ffmpeg wasn't allowed to touch
+        for output_path in written_paths:
+            if output_path.exists():
+                output_path.unlink()
+        # A failed group is retried file by file, so the caller decides how
+        # to report it; only a single merge's failure is final
+        if len(jobs) == 1:
+            logger.error("Error merging video and audio: %s", stderr_tail(result.stderr))
+        raise ffmpeg.Error("ffmpeg", None, result.stderr)
+    
+    for output_str in output_strs:
+        logger.info("Successfully merged video and audio: %s", output_str)
+    return output_strs
+
+
 def batch_merge_videos_with_audio(
     videos_dir: Union[str, Path],
     audio_dir: Union[str, Path],
     output_dir: Optional[Union[str, Path]] = None,
-    video_extensions: tuple = (".mp4", ".avi", ".mov", ".mkv", ".webm"),
+    video_extensions: frozenset = VIDEO_EXTENSIONS,
     video_codec: str = "copy",
-    overwrite: bool = False
+    overwrite: bool = False,
+    concurrency: int = 1,
+    files_per_process: int = 1,
+    skip_existing: bool = True
 ) -> list:
     """
     Batch merge videos with audio files.
@@ -114,9 +458,14 @@ def batch_merge_videos_with_audio(
         videos_dir: Directory containing video files
         audio_dir: Directory containing audio files
         output_dir: Directory to save merged videos (optional)
-        video_extensions: Tuple of video file extensions to process
+        video_extensions: Set of video file extensions to process
         video_codec: Video codec to use (default: copy - no re-encoding)
         overwrite: Whether to overwrite output files if they exist (default: False)
+        concurrency: Number of ffmpeg processes to run at the same time (default: 1)
+        files_per_process: Number of videos each ffmpeg process merges; groups
+            that fail are retried one video at a time (default: 1)
+        skip_existing: Whether to skip videos whose output already exists when
+            not overwriting, instead of writing a "_new" copy (default: True)
         
     Returns:
         List of paths to the merged video files
@@ -124,10 +473,10 @@ def batch_merge_videos_with_audio(
     videos_dir = Path(videos_dir)
     audio_dir = Path(audio_dir)
     
-    if not videos_dir.exists() or not videos_dir.is_dir():
+    if not videos_dir.is_dir():
         raise NotADirectoryError(f"Videos directory not found: {videos_dir}")
     
-    if not audio_dir.exists() or not audio_dir.is_dir():
+    if not audio_dir.is_dir():
         raise NotADirectoryError(f"Audio directory not found: {audio_dir}")
     
     if output_dir is None:
@@ -138,50 +487,109 @@ def batch_merge_videos_with_audio(
     # Create output directory if it doesn't exist
     output_dir.mkdir(parents=True, exist_ok=True)
     
+    import ffmpeg
+    
     # Find all video files in the videos directory
-    video_files = [
-        f for f in videos_dir.iterdir()
-        if f.is_file() and f.suffix.lower() in video_extensions
-    ]
+    video_files = find_files(videos_dir, video_extensions)
     
     if not video_files:
-        logger.warning(f"No video files found in {videos_dir}")
+        logger.warning("No video files found in %s", videos_dir)
         return []
     
-    logger.info(f"Found {len(video_files)} video files to process")
+    logger.info("Found %d video files to process", len(video_files))
     
-    # Process each video file
-    output_files = []
-    for video_file in video_files:
-        # Look for matching audio file
-        # Try both stem_isolated.mp3 and stem.mp3 patterns
-        potential_audio_files = [
-            audio_dir / f"{video_file.stem}_isolated.mp3",
-            audio_dir / f"{video_file.stem}.mp3"
-        ]
-        
-        matching_audio_file = None
-        for audio_file in potential_audio_files:
-            if audio_file.exists():
-                matching_audio_file = audio_file
-                break
-        
-        if matching_audio_file is None:
-            logger.warning(f"No matching audio found for {video_file}")
-            continue
-        
-        output_file = output_dir / f"{video_file.stem}_clean{video_file.suffix}"
+    # List the audio directory once, rather than probing it for every video
+    audio_index = {
+        os.path.splitext(audio_file.name)[0]: audio_file
+        for audio_file in find_files(audio_dir, (".mp3",))
+    }
+    
+    def _merge_group(group: List[Tuple[Path, Path, Path]]) -> List[Optional[str]]:
+        # Returns one entry per job, None where that video failed
+        if len(group) > 1:
+            try:
+                return _merge_in_one_process(group, static_args, overwrite)
+            except ffmpeg.Error as e:
+                logger.warning(
+                    "Merging %d videos in one process failed, retrying one at a time: %s",
+                    len(group), stderr_tail(e.stderr)
+                )
+            except Exception as e:
+                logger.warning("Merging %d videos in one process failed, retrying one at a time: %s", len(group), e)
         
+        merged_files = []
+        for job in group:
+            try:
+                merged_files.extend(_merge_in_one_process([job], static_args, overwrite))
+            except Exception as e:
+                logger.error("Error processing %s: %s", job[0], e)
+                merged_files.append(None)
+        return merged_files
+    
+    # Merge the pairs, `files_per_process` per ffmpeg run, keeping up to
+    # `concurrency` runs going. Each merge is a separate ffmpeg process on
+    # separate files, so threads are enough. A group is submitted as soon as
+    # it is full, so ffmpeg is already working while the rest are matched.
+    group_size = max(1, files_per_process)
+    concurrency = max(1, concurrency)
+    
+    # Share the CPUs between the concurrent ffmpeg processes, and between the
+    # outputs of each, which would otherwise each start a thread per CPU
+    # when re-encoding
+    threads = max(1, (os.cpu_count() or 1) // (concurrency * group_size))
+    
+    # Every merge in the batch shares the same options, so the constant part
+    # of the command line is built once
+    static_args = _static_merge_args(video_codec, overwrite, threads)
+    
+    # One slot per video, in directory order: either the existing output of a
+    # skipped video, or the (group number, position) of its merge
+    slots = []
+    futures = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
         try:
-            merged_file = merge_video_with_audio(
-                video_path=video_file,
-                audio_path=matching_audio_file,
-                output_path=output_file,
-                video_codec=video_codec,
-                overwrite=overwrite
-            )
-            output_files.append(merged_file)
-        except Exception as e:
-            logger.error(f"Error processing {video_file}: {e}")
+            group = []
+            for video_file in video_files:
+                # Match on the plain name strings; only the output needs a new Path
+                stem, suffix = os.path.splitext(video_file.name)
+                
+                # Look for matching audio file
+                # Try both stem_isolated.mp3 and stem.mp3 patterns
+                matching_audio_file = audio_index.get(stem + "_isolated") or audio_index.get(stem)
+                
+                if matching_audio_file is None:
+                    logger.warning("No matching audio found for %s", video_file)
+                    continue
+                
+                output_file = output_dir / f"{stem}_clean{suffix}"
+                if skip_existing and not overwrite and output_file.exists():
+                    logger.info("Skipping existing output: %s", output_file)
+                    slots.append(str(output_file))
+                    continue
+                
+                slots.append((len(futures), len(group)))
+                group.append((video_file, matching_audio_file, output_file))
+                if len(group) == group_size:
+                    futures.append(executor.submit(_merge_group, group))
+                    group = []
+            
+            if group:
+                futures.append(executor.submit(_merge_group, group))
+            
+            output_files = []
+            for slot in slots:
+                if isinstance(slot, str):
+                    output_files.append(slot)
+                    continue
+                group_number, position = slot
+                merged_file = futures[group_number].result()[position]
+                if merged_file is not None:
+                    output_files.append(merged_file)
+        except BaseException:
+            # On Ctrl-C, don't let the pool start the queued merges before
+            # the interrupt gets through; only those already running finish
+            for future in futures:
+                future.cancel()
+            raise
     
     return output_files